@@ -1,18 +1,18 @@
 # bluejays_transactions.py - GitHub Actions version
 import requests
 import datetime
-import json
 import os
 import re
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
 import pytz
 import logging
+import secrets
 import sys
-import ssl
 from typing import List, Dict, Any, Optional, Tuple
 
+import state
+from notifier import Notifier, SMTPChannel, WebhookChannel, FileChannel, load_recipients, parse_recipients
+from watchlist import AhoCorasick, load_watchlist, transaction_text
+
 # Configure basic logging
 logging.basicConfig(
     level=logging.INFO,
@@ -24,8 +24,21 @@ logger = logging.getLogger(__name__)
 # Configuration for GitHub Actions environment
 # Root of the repository
 REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+STATE_FILE = os.path.join(REPO_ROOT, "checker_state.json")
+# Legacy state files, read once to migrate into STATE_FILE
 DATA_FILE = os.path.join(REPO_ROOT, "last_check.json")
 TRANSACTIONS_FILE = os.path.join(REPO_ROOT, "last_transactions.json")
+# Optional player/team/keyword watchlist
+WATCHLIST_FILE = os.path.join(REPO_ROOT, "watchlist.json")
+# Notification recipients and the notifier's retry queue / delivery log.
+# Recipients come from the RECIPIENTS_JSON secret; the file is a local-only
+# fallback and is never committed.
+RECIPIENTS_JSON = os.environ.get("RECIPIENTS_JSON", "")  # Set in GitHub secret
+RECIPIENTS_FILE = os.path.join(REPO_ROOT, "recipients.json")
+NOTIFY_STATE_FILE = os.path.join(REPO_ROOT, "notify_state.json")
+# Key for the recipient HMACs stored in NOTIFY_STATE_FILE
+NOTIFY_KEY_SECRET = os.environ.get("NOTIFY_KEY_SECRET", "")  # Set in GitHub secret
+NOTIFY_KEY_FILE = os.path.join(REPO_ROOT, ".notify_key")  # Local-only fallback
 
 # URL for transaction data (in the same repository)
 GITHUB_TRANSACTIONS_URL = "https://raw.githubusercontent.com/gkatoh1/MLB-Transactions/refs/heads/main/transactions.json"
@@ -34,12 +47,18 @@ TEAM_NAME = "Toronto Blue Jays"
 TEAM_ABBREVIATION = "TOR"
 
 # Email configuration - Get password from GitHub secrets
-EMAIL_TO = ""
+EMAIL_TO = os.environ.get("EMAIL_TO", "")  # Used when no recipients are configured
 EMAIL_FROM = "gosukekatoh@gmail.com"
 EMAIL_PASSWORD = os.environ.get("EMAIL_PASSWORD")  # Set in GitHub secret
-SMTP_SERVER = "smtp.gmail.com"
-SMTP_PORT = 465   # For Gmail SSL
-EMAIL_ENABLED = True if EMAIL_PASSWORD else False
+SMTP_SERVER = os.environ.get("SMTP_SERVER", "smtp.gmail.com")
+SMTP_PORT = int(os.environ.get("SMTP_PORT", "465"))   # For Gmail SSL
+SMTP_USE_SSL = os.environ.get("SMTP_USE_SSL", "1") != "0"
+# A plain SMTP server (e.g. a local debug server) doesn't need a password
+EMAIL_ENABLED = True if EMAIL_PASSWORD or not SMTP_USE_SSL else False
+
+# Concurrent deliveries and attempts per recipient before giving up
+NOTIFY_MAX_WORKERS = 8
+NOTIFY_MAX_ATTEMPTS = 5
 
 # Team name mapping (common abbreviations and full names)
 TEAM_MAPPING = {
@@ -376,16 +395,21 @@ def get_transactions_from_github(since_date: Optional[datetime.date] = None) ->
     logger.info(f"Found {len(transactions)} transactions since {since_date}")
     return transactions
 
+def load_checker_state() -> Dict[str, Any]:
+    """
+    Load the versioned checker state, migrating the legacy files if needed
+    """
+    return state.load_state(STATE_FILE, DATA_FILE, TRANSACTIONS_FILE)
+
 def get_last_check_time() -> datetime.datetime:
     """
     Get the timestamp of the last transaction check
     Modified for GitHub Actions to handle file persistence
     """
     try:
-        if os.path.exists(DATA_FILE):
-            with open(DATA_FILE, 'r') as f:
-                data = json.load(f)
-                return datetime.datetime.fromisoformat(data.get('last_check', '2000-01-01T00:00:00'))
+        last_check = state.parse_last_check(load_checker_state())
+        if last_check:
+            return last_check
         else:
             # If no previous check or file doesn't exist, return 24h ago
             logger.info("No previous check found, using 24 hours ago")
@@ -401,10 +425,7 @@ def update_last_check_time() -> None:
     """
     try:
         current_time = datetime.datetime.now().isoformat()
-        data = {'last_check': current_time}
-
-        with open(DATA_FILE, 'w') as f:
-            json.dump(data, f)
+        state.update_state(STATE_FILE, DATA_FILE, TRANSACTIONS_FILE, last_check=current_time)
 
         logger.info(f"Updated last check time to {current_time}")
     except Exception as e:
@@ -413,26 +434,20 @@ def update_last_check_time() -> None:
 def get_last_transactions() -> List[Dict[str, Any]]:
     """
     Get the transactions from the previous check
+    Raises if the stored state can't be read, so callers don't mistake
+    unreadable state for an empty one.
     """
-    try:
-        if os.path.exists(TRANSACTIONS_FILE):
-            with open(TRANSACTIONS_FILE, 'r') as f:
-                return json.load(f)
-        else:
-            # If no previous transactions, return empty list
-            logger.info("No previous transactions found")
-            return []
-    except Exception as e:
-        logger.error(f"Error getting last transactions: {e}")
-        return []
+    transactions = state.get_stored_transactions(load_checker_state())
+    if not transactions:
+        logger.info("No previous transactions found")
+    return transactions
 
 def update_last_transactions(transactions: List[Dict[str, Any]]) -> None:
     """
     Update the stored transactions from the current check
     """
     try:
-        with open(TRANSACTIONS_FILE, 'w') as f:
-            json.dump(transactions, f)
+        state.update_state(STATE_FILE, DATA_FILE, TRANSACTIONS_FILE, last_transactions=transactions)
 
         logger.info(f"Updated last transactions with {len(transactions)} transactions")
     except Exception as e:
@@ -449,9 +464,10 @@ def transactions_have_changed(new_transactions: List[Dict[str, Any]], old_transa
     # If there are any differences, return True
     return old_details != new_details
 
-def filter_relevant_transactions(transactions: List[Dict[str, Any]], upcoming_opponents: List[str]) -> List[Dict[str, Any]]:
+def filter_relevant_transactions(transactions: List[Dict[str, Any]], upcoming_opponents: List[str], watchlist: Optional[AhoCorasick] = None) -> List[Dict[str, Any]]:
     """
     Filter transactions to include only upcoming opponents (exclude Blue Jays)
+    Transactions matching the watchlist are always included, Blue Jays or not
     """
     # Only include upcoming opponents, explicitly exclude Blue Jays
     relevant_teams = upcoming_opponents
@@ -459,6 +475,15 @@ def filter_relevant_transactions(transactions: List[Dict[str, Any]], upcoming_op
 
     for transaction in transactions:
         team = transaction['team']
+
+        # Watchlist hits are explicit interest, so they bypass the opponent filter
+        if watchlist:
+            matches = watchlist.search(transaction_text(transaction))
+            if matches:
+                logger.info(f"Watchlist match {sorted(matches)} in {team} transaction on {transaction.get('date', '')}")
+                relevant_transactions.append(transaction)
+                continue
+
         # Exclude Blue Jays transactions
         if TEAM_NAME in team or TEAM_ABBREVIATION in team:
             continue
@@ -540,50 +565,49 @@ def generate_email_subject(relevant_transactions: List[Dict[str, Any]]) -> str:
     else:
         return "TRANSACTION UPDATE"
 
-def send_email(subject: str, body: str) -> bool:
+def get_recipients() -> List[Dict[str, Any]]:
     """
-    Send an email notification using Gmail with SSL
-    Returns True if successful, False otherwise
+    Get notification recipients from RECIPIENTS_JSON, then recipients.json,
+    falling back to EMAIL_TO
     """
-    if not EMAIL_ENABLED:
-        logger.info("Email notifications are disabled")
-        return False
-
-    try:
-        msg = MIMEMultipart()
-        msg['From'] = EMAIL_FROM
-        msg['To'] = EMAIL_TO
-        msg['Subject'] = subject
-
-        msg.attach(MIMEText(body, 'plain'))
-
-        # Create SSL context for secure connection
-        context = ssl.create_default_context()
-
-        # Use SMTP_SSL for Gmail
-        with smtplib.SMTP_SSL(SMTP_SERVER, SMTP_PORT, context=context) as server:
-            # Authenticate with Gmail
-            if EMAIL_PASSWORD:
-                server.login(EMAIL_FROM, EMAIL_PASSWORD)
-            else:
-                logger.error("No EMAIL_PASSWORD set in environment variable")
-                print("ERROR: You need to set your email password in GitHub Secrets")
-                return False
-
-            server.send_message(msg)
+    if RECIPIENTS_JSON:
+        recipients = parse_recipients(RECIPIENTS_JSON, "RECIPIENTS_JSON")
+    else:
+        recipients = load_recipients(RECIPIENTS_FILE)
+    if not recipients and EMAIL_TO:
+        recipients = [{'channel': 'smtp', 'address': EMAIL_TO}]
+    return recipients
 
-        logger.info(f"Email sent to {EMAIL_TO}")
-        print(f"Email successfully sent to {EMAIL_TO}")
-        return True
+def get_notify_key_secret() -> str:
+    """
+    Get the key for recipient HMACs from NOTIFY_KEY_SECRET
+    Without it, a random key is kept in NOTIFY_KEY_FILE. That file isn't
+    committed, so on GitHub Actions every run would get a new key and lose
+    the retry queue and delivery history.
+    """
+    if NOTIFY_KEY_SECRET:
+        return NOTIFY_KEY_SECRET
 
-    except Exception as e:
-        logger.error(f"Error sending email: {e}")
-        # Add more detailed error info for debugging
-        import traceback
-        logger.error(traceback.format_exc())
-        print(f"\nError sending email: {e}")
-        print("Please check your email settings and GitHub Secrets.")
-        return False
+    logger.warning(f"NOTIFY_KEY_SECRET not set, using the local key in {os.path.basename(NOTIFY_KEY_FILE)}")
+    try:
+        fd = os.open(NOTIFY_KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(NOTIFY_KEY_FILE, 'r') as f:
+            return f.read().strip()
+    key = secrets.token_hex(32)
+    with os.fdopen(fd, 'w') as f:
+        f.write(key + "\n")
+    return key
+
+def build_notifier() -> Notifier:
+    """
+    Create the notifier with every channel that is configured
+    """
+    channels = [WebhookChannel(), FileChannel()]
+    if EMAIL_ENABLED:
+        channels.append(SMTPChannel(SMTP_SERVER, SMTP_PORT, EMAIL_FROM, EMAIL_PASSWORD, use_ssl=SMTP_USE_SSL))
+    return Notifier(channels, NOTIFY_STATE_FILE, get_notify_key_secret(),
+                    max_workers=NOTIFY_MAX_WORKERS, max_attempts=NOTIFY_MAX_ATTEMPTS)
 
 def main(today_only=False):
     """
@@ -591,55 +615,73 @@ def main(today_only=False):
     Modified for GitHub Actions environment
     """
     try:
-        # Get Blue Jays upcoming opponents from hardcoded schedule
-        upcoming_opponents = get_blue_jays_schedule()
-
-        # Get transactions from GitHub
-        if today_only:
-            # Get only today's transactions
-            today = datetime.datetime.now().date()
-            transactions = get_transactions_from_github(today)
-        else:
-            # For GitHub Actions, we get transactions since last check
-            last_check_time = get_last_check_time()
-            transactions = get_transactions_from_github(last_check_time.date())
-
-        # Filter for relevant transactions (only opponents)
-        relevant_transactions = filter_relevant_transactions(transactions, upcoming_opponents)
-
-        # Try to get previous transactions, but handle case where file doesn't exist
-        try:
-            last_transactions = get_last_transactions()
-            has_new_transactions = transactions_have_changed(relevant_transactions, last_transactions)
-        except Exception as e:
-            logger.warning(f"Error comparing with previous transactions: {e}, assuming all are new")
-            has_new_transactions = True if relevant_transactions else False
-
-        # Generate report
-        report = generate_report(relevant_transactions, upcoming_opponents)
-
-        # Print report to console (visible in GitHub Actions logs)
-        print("\n" + report)
-
-        # Send email with updated subject line if there are new transactions
-        if relevant_transactions and (today_only or has_new_transactions):
-            if EMAIL_ENABLED:
-                subject = generate_email_subject(relevant_transactions)
-                email_sent = send_email(subject, report)
-                
-                # Only update stored transactions if email was successfully sent
-                if email_sent:
-                    update_last_transactions(relevant_transactions)
+        # Hold the state lock for the whole run so overlapping runs in the same
+        # checkout (e.g. a local cron job and a manual run) can't interleave their
+        # read-compare-write. Separate GitHub Actions runs each get a fresh checkout;
+        # the workflows' shared concurrency group serializes those instead.
+        with state.file_lock(STATE_FILE):
+            # Get Blue Jays upcoming opponents from hardcoded schedule
+            upcoming_opponents = get_blue_jays_schedule()
+
+            # Get transactions from GitHub
+            if today_only:
+                # Get only today's transactions
+                today = datetime.datetime.now().date()
+                transactions = get_transactions_from_github(today)
             else:
-                print("Email is disabled (EMAIL_PASSWORD not set in GitHub Secrets)")
-        else:
-            if not relevant_transactions:
-                print("No email sent (no transactions found)")
-            elif not has_new_transactions:
-                print("No email sent (no new transactions compared to previous check)")
+                # For GitHub Actions, we get transactions since last check
+                last_check_time = get_last_check_time()
+                transactions = get_transactions_from_github(last_check_time.date())
+
+            # Filter for relevant transactions (opponents plus watchlist hits)
+            watchlist = load_watchlist(WATCHLIST_FILE, TEAM_MAPPING)
+            relevant_transactions = filter_relevant_transactions(transactions, upcoming_opponents, watchlist)
 
-        # Update last check time
-        update_last_check_time()
+            # Try to get previous transactions, but handle case where file doesn't exist
+            try:
+                last_transactions = get_last_transactions()
+                has_new_transactions = transactions_have_changed(relevant_transactions, last_transactions)
+            except Exception as e:
+                logger.warning(f"Error comparing with previous transactions: {e}, assuming all are new")
+                has_new_transactions = True if relevant_transactions else False
+
+            # Generate report
+            report = generate_report(relevant_transactions, upcoming_opponents)
+
+            # Print report to console (visible in GitHub Actions logs)
+            print("\n" + report)
+
+            # Update last check time before delivery so a slow recipient can't hold it up
+            update_last_check_time()
+
+            # Notify with updated subject line if there are new transactions
+            notifier = build_notifier()
+            recipients = get_recipients()
+            dispatched = False
+            if relevant_transactions and (today_only or has_new_transactions):
+                if any(notifier.recipient_key(r) for r in recipients):
+                    subject = generate_email_subject(relevant_transactions)
+                    # --today is an explicit request for the report, so send it even to
+                    # recipients who already got the same message
+                    results = notifier.dispatch(recipients, subject, report, force=today_only)
+                    dispatched = True
+                    delivered = [rid for rid, ok in results.items() if ok]
+                    print(f"Notification delivered to {len(delivered)} of {len(results)} recipients")
+
+                    # Failed recipients are queued for retry with this same message, so
+                    # storing the transactions now can't lose the alert or re-send it
+                    update_last_transactions(relevant_transactions)
+                else:
+                    print("Notifications are disabled (no recipients with a configured channel, or EMAIL_PASSWORD not set in GitHub Secrets)")
+            else:
+                if not relevant_transactions:
+                    print("No notification sent (no transactions found)")
+                elif not has_new_transactions:
+                    print("No notification sent (no new transactions compared to previous check)")
+
+            # dispatch() retries the queue itself; otherwise retry anything that failed earlier
+            if not dispatched:
+                notifier.retry_queued(recipients)
 
     except Exception as e:
         error_msg = f"Error in main function: {e}"
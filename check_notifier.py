@@ -0,0 +1,160 @@
+# check_notifier.py - Exercise Notifier.dispatch against local stand-in servers
+# Usage: python check_notifier.py
+import json
+import os
+import socketserver
+import sys
+import tempfile
+import threading
+from email import message_from_bytes
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+from notifier import FileChannel, Notifier, SMTPChannel, WebhookChannel
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    """
+    Just enough SMTP to accept messages from smtplib and keep them in memory
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('localhost', 0), SMTPSinkHandler)
+        self.messages: List[Any] = []
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode('ascii'))
+
+    def handle(self) -> None:
+        self.reply("220 localhost SMTP sink")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', 'replace').strip().split(' ', 1)[0].upper()
+            if command == 'DATA':
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                data = []
+                for data_line in iter(self.rfile.readline, b''):
+                    if data_line in (b".\r\n", b".\n"):
+                        break
+                    data.append(data_line[1:] if data_line.startswith(b"..") else data_line)
+                self.server.messages.append(message_from_bytes(b"".join(data)))
+                self.reply("250 OK")
+            elif command == 'QUIT':
+                self.reply("221 Bye")
+                return
+            else:
+                # EHLO/HELO, MAIL, RCPT, RSET, NOOP
+                self.reply("250 OK")
+
+class EchoServer(ThreadingHTTPServer):
+    """
+    HTTP stand-in for webhooks: /ok echoes the body, /fail always returns
+    500, and /flaky returns 500 until `flaky_ok` is set
+    """
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('localhost', 0), EchoHandler)
+        self.received: Dict[str, List[Dict[str, Any]]] = {'/ok': [], '/fail': [], '/flaky': []}
+        self.flaky_ok = False
+
+class EchoHandler(BaseHTTPRequestHandler):
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.server.received.setdefault(self.path, []).append(json.loads(body))
+        if self.path == '/fail' or (self.path == '/flaky' and not self.server.flaky_ok):
+            self.send_response(500)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+def serve(server: socketserver.BaseServer) -> None:
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+def check(condition: bool, description: str) -> None:
+    print(f"{'ok  ' if condition else 'FAIL'} {description}")
+    if not condition:
+        sys.exit(1)
+
+def main() -> None:
+    smtp, echo = SMTPSink(), EchoServer()
+    serve(smtp)
+    serve(echo)
+    webhook_base = f"http://localhost:{echo.server_address[1]}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sink_path = os.path.join(tmp, "alerts.jsonl")
+        state_file = os.path.join(tmp, "notify_state.json")
+        notifier = Notifier(
+            [SMTPChannel('localhost', smtp.server_address[1], 'checker@example.com', use_ssl=False, timeout=5),
+             WebhookChannel(timeout=5), FileChannel()],
+            state_file, "check-notifier-key", max_workers=4, max_attempts=3,
+        )
+        recipients = [{'channel': 'smtp', 'address': f"fan{i}@example.com"} for i in range(3)] + [
+            {'channel': 'webhook', 'url': f"{webhook_base}/ok"},
+            {'channel': 'webhook', 'url': f"{webhook_base}/fail"},
+            {'channel': 'webhook', 'url': f"{webhook_base}/flaky"},
+            {'channel': 'file', 'path': sink_path},
+        ]
+        keys = [notifier.recipient_key(r) for r in recipients]
+
+        def queue() -> List[Dict[str, Any]]:
+            with open(state_file) as f:
+                return json.load(f)['queue']
+
+        def sink_lines() -> int:
+            with open(sink_path) as f:
+                return len(f.readlines())
+
+        # First dispatch: everyone but /fail and /flaky gets it, those two are queued
+        results = notifier.dispatch(recipients, "TRANSACTION UPDATE", "report body")
+        check(all(results[k] for k in keys[:4] + keys[6:]), "working recipients delivered")
+        check(not results[keys[4]] and not results[keys[5]], "failing recipients reported as failed")
+        check(len(smtp.messages) == 3 and len(echo.received['/ok']) == 1 and sink_lines() == 1,
+              "each working recipient received exactly one message")
+        check(sorted(m['To'] for m in smtp.messages) == [r['address'] for r in recipients[:3]],
+              "one email per SMTP recipient")
+        check({job['recipient'] for job in queue()} == {keys[4], keys[5]}, "failed deliveries queued")
+
+        # Rerun with the same message: only the queued recipients are tried again
+        notifier.dispatch(recipients, "TRANSACTION UPDATE", "report body")
+        check(len(smtp.messages) == 3 and len(echo.received['/ok']) == 1 and sink_lines() == 1,
+              "rerun does not re-send to delivered recipients")
+        check(len(echo.received['/fail']) == 2 and len(echo.received['/flaky']) == 2, "rerun retried queued recipients")
+
+        # /flaky recovers and /fail hits max_attempts, which empties the queue
+        echo.flaky_ok = True
+        notifier.retry_queued(recipients)
+        check(len(echo.received['/flaky']) == 3 and len(echo.received['/fail']) == 3, "retry_queued retried both")
+        check(queue() == [], "retry_queued cleared the queue")
+        notifier.retry_queued(recipients)
+        check(len(echo.received['/fail']) == 3, "nothing retried once the queue is empty")
+
+        # force re-sends a message that was already delivered
+        results = notifier.dispatch(recipients[6:], "TRANSACTION UPDATE", "report body", force=True)
+        check(results == {keys[6]: True} and sink_lines() == 2, "force re-sends to a delivered recipient")
+
+        with open(state_file) as f:
+            stored = f.read()
+        check(not any(r.get('address', r.get('url', r.get('path'))) in stored for r in recipients),
+              "state file holds no recipient addresses")
+        other = Notifier(list(notifier.channels.values()), state_file, "another-key")
+        check(all(other.recipient_key(r) != k for r, k in zip(recipients, keys)),
+              "recipient keys depend on the secret")
+
+    smtp.shutdown()
+    echo.shutdown()
+    print("All notifier checks passed")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# export_parquet.py - Incremental, month-partitioned Parquet export of transactions.json
+import datetime
+import json
+import logging
+import os
+import re
+import sys
+from typing import Any, Dict, List, Tuple
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import state
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[logging.StreamHandler()]
+)
+logger = logging.getLogger(__name__)
+
+REPO_ROOT = os.path.dirname(os.path.abspath(__file__))
+TRANSACTIONS_FILE = os.path.join(REPO_ROOT, "transactions.json")
+# Hive-style layout: archive/month=YYYY-MM/part-0.parquet
+ARCHIVE_DIR = os.path.join(REPO_ROOT, "archive")
+# Leading underscore keeps pyarrow/pandas from treating it as data
+EXPORT_STATE_NAME = "_export_state.json"
+PARTITION_FILE_NAME = "part-0.parquet"
+
+EXPORT_STATE_VERSION = 1
+
+# Team and action repeat heavily, so store them dictionary-encoded
+SCHEMA = pa.schema([
+    ('date', pa.date32()),
+    ('team', pa.dictionary(pa.int32(), pa.string())),
+    ('action', pa.dictionary(pa.int32(), pa.string())),
+    ('player', pa.string()),
+    ('details', pa.string()),
+])
+
+def extract_action(team: str, details: str) -> str:
+    """
+    Pull the action verb out of the scraped details
+    Example: "Los Angeles Angelsplaced 1BNolan Schanuel..." -> "placed"
+    """
+    rest = details[len(team):] if team and details.startswith(team) else details
+    match = re.match(r'\s*([a-z]+)', rest)
+    return match.group(1) if match else "unknown"
+
+def transaction_key(row: Dict[str, Any]) -> Tuple[str, str, str]:
+    """
+    Identity of a transaction, matching transactions_have_changed in the checker
+    """
+    return (row.get('team', ''), row.get('date', ''), row.get('details', ''))
+
+def partition_dir(archive_dir: str, month: str) -> str:
+    return os.path.join(archive_dir, f"month={month}")
+
+def group_by_month(transactions: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Split transactions into month partitions ("YYYY-MM"), skipping undated ones
+    """
+    partitions: Dict[str, List[Dict[str, Any]]] = {}
+    for transaction in transactions:
+        date_str = transaction.get('date', '')
+        try:
+            datetime.date.fromisoformat(date_str)
+        except (TypeError, ValueError):
+            logger.warning(f"Skipping transaction with invalid date {date_str!r}")
+            continue
+
+        team = transaction.get('team', '')
+        details = transaction.get('details', '')
+        partitions.setdefault(date_str[:7], []).append({
+            'date': date_str,
+            'team': team,
+            'action': extract_action(team, details),
+            'player': transaction.get('player', ''),
+            'details': details,
+        })
+    return partitions
+
+def read_partition(path: str) -> List[Dict[str, Any]]:
+    """
+    Read an existing partition file back into row dicts
+    """
+    rows = pq.read_table(path, schema=SCHEMA).to_pylist()
+    for row in rows:
+        row['date'] = row['date'].isoformat()
+    return rows
+
+def write_partition(path: str, rows: List[Dict[str, Any]]) -> None:
+    """
+    Atomically write one partition, sorted so row-group statistics are useful
+    """
+    rows = sorted(rows, key=lambda r: (r['date'], r['team'], r['details']))
+    table = pa.Table.from_pydict({
+        'date': [datetime.date.fromisoformat(r['date']) for r in rows],
+        'team': [r['team'] for r in rows],
+        'action': [r['action'] for r in rows],
+        'player': [r['player'] for r in rows],
+        'details': [r['details'] for r in rows],
+    }, schema=SCHEMA)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with state.atomic_output(path, 'wb') as f:
+        pq.write_table(table, f, compression='zstd')
+
+def load_export_state(path: str) -> Dict[str, Any]:
+    """
+    Load the bookkeeping from the previous export, or an empty one
+    `partitions` lists every month written so far, so a deleted partition
+    file can be noticed even when the source hasn't changed.
+    """
+    empty = {'version': EXPORT_STATE_VERSION, 'source_last_updated': None, 'partitions': []}
+    if not os.path.exists(path):
+        return empty
+    try:
+        with open(path, 'r') as f:
+            data = json.load(f)
+        if data.get('version') != EXPORT_STATE_VERSION:
+            raise ValueError(f"unsupported version {data.get('version')!r}")
+        # Earlier exports stored {month: {'rows': n}}; only the months are used
+        data['partitions'] = sorted(data.get('partitions') or [])
+        return data
+    except Exception as e:
+        logger.error(f"Error reading export state {path}, re-scanning partitions: {e}")
+        return empty
+
+def export_archive(transactions_file: str = TRANSACTIONS_FILE, archive_dir: str = ARCHIVE_DIR) -> List[str]:
+    """
+    Merge transactions_file into the Parquet archive
+    Only partitions that gained new transactions are rewritten; a source file
+    that hasn't changed since the last export is skipped entirely, unless a
+    previously exported partition file has gone missing. Returns the months
+    that were written.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    export_state_file = os.path.join(archive_dir, EXPORT_STATE_NAME)
+
+    with state.file_lock(export_state_file):
+        with open(transactions_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+
+        last_updated = data.get('last_updated')
+        export_state = load_export_state(export_state_file)
+        exported = set(export_state['partitions'])
+        missing = sorted(
+            month for month in exported
+            if not os.path.exists(os.path.join(partition_dir(archive_dir, month), PARTITION_FILE_NAME))
+        )
+
+        if last_updated and last_updated == export_state.get('source_last_updated') and not missing:
+            logger.info(f"Archive already up to date with source from {last_updated}")
+            return []
+        if missing:
+            logger.warning(f"Partition files missing for {missing}, re-exporting")
+
+        source_partitions = group_by_month(data.get('transactions', []))
+        for month in missing:
+            if month not in source_partitions:
+                # transactions.json only holds the latest scrape, so older months are gone for good
+                logger.error(f"Partition {month} is missing and can't be rebuilt from {transactions_file}")
+                exported.discard(month)
+
+        changed = []
+        for month, new_rows in sorted(source_partitions.items()):
+            path = os.path.join(partition_dir(archive_dir, month), PARTITION_FILE_NAME)
+            existing = read_partition(path) if os.path.exists(path) else []
+            if existing:
+                exported.add(month)
+
+            merged = {transaction_key(row): row for row in existing}
+            for row in new_rows:
+                merged.setdefault(transaction_key(row), row)
+
+            if len(merged) == len(existing):
+                continue
+
+            write_partition(path, list(merged.values()))
+            exported.add(month)
+            changed.append(month)
+            logger.info(f"Wrote {len(merged) - len(existing)} new transactions to partition {month}")
+
+        export_state['partitions'] = sorted(exported)
+        export_state['source_last_updated'] = last_updated
+        state.atomic_write_json(export_state_file, export_state, indent=2)
+
+    logger.info(f"Export complete, {len(changed)} partitions changed: {changed}")
+    return changed
+
+if __name__ == "__main__":
+    # Usage: python export_parquet.py [transactions.json] [archive_dir]
+    export_archive(*sys.argv[1:3])
@@ -0,0 +1,338 @@
+# notifier.py - Fan-out delivery of alerts to many recipients over pluggable channels
+import abc
+import datetime
+import hashlib
+import hmac
+import json
+import logging
+import os
+import smtplib
+import ssl
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from typing import Any, Dict, List, Optional
+
+import requests
+
+import state
+
+logger = logging.getLogger(__name__)
+
+# Version 1 stored raw recipient addresses and version 2 unkeyed hashes of
+# them; both are discarded on load
+NOTIFY_STATE_VERSION = 3
+
+# Message ids remembered per recipient for dedup
+DELIVERED_HISTORY = 100
+
+class Channel(abc.ABC):
+    """
+    A way of delivering a message to one recipient
+    Subclasses set `name` (matched against a recipient's "channel") and
+    implement recipient_address() and deliver(), raising on failure.
+    """
+    name = ""
+
+    @abc.abstractmethod
+    def recipient_address(self, recipient: Dict[str, Any]) -> str:
+        """
+        Return the field that identifies `recipient` on this channel
+        """
+
+    @abc.abstractmethod
+    def deliver(self, recipient: Dict[str, Any], subject: str, body: str) -> None:
+        """
+        Send one message to `recipient`
+        """
+
+class SMTPChannel(Channel):
+    """
+    Email over SMTP; recipients look like {"channel": "smtp", "address": "..."}
+    """
+    name = "smtp"
+
+    def __init__(self, server: str, port: int, sender: str, password: Optional[str] = None,
+                 use_ssl: bool = True, timeout: float = 30):
+        self.server = server
+        self.port = port
+        self.sender = sender
+        self.password = password
+        self.use_ssl = use_ssl
+        self.timeout = timeout
+
+    def recipient_address(self, recipient: Dict[str, Any]) -> str:
+        return recipient['address']
+
+    def deliver(self, recipient: Dict[str, Any], subject: str, body: str) -> None:
+        msg = MIMEMultipart()
+        msg['From'] = self.sender
+        msg['To'] = recipient['address']
+        msg['Subject'] = subject
+        msg.attach(MIMEText(body, 'plain'))
+
+        if self.use_ssl:
+            context = ssl.create_default_context()
+            server = smtplib.SMTP_SSL(self.server, self.port, context=context, timeout=self.timeout)
+        else:
+            server = smtplib.SMTP(self.server, self.port, timeout=self.timeout)
+
+        with server:
+            if self.password:
+                server.login(self.sender, self.password)
+            server.send_message(msg)
+
+class WebhookChannel(Channel):
+    """
+    JSON POST to a URL; recipients look like {"channel": "webhook", "url": "..."}
+    """
+    name = "webhook"
+
+    def __init__(self, timeout: float = 15):
+        self.timeout = timeout
+
+    def recipient_address(self, recipient: Dict[str, Any]) -> str:
+        return recipient['url']
+
+    def deliver(self, recipient: Dict[str, Any], subject: str, body: str) -> None:
+        response = requests.post(recipient['url'], json={'subject': subject, 'body': body}, timeout=self.timeout)
+        response.raise_for_status()
+
+class FileChannel(Channel):
+    """
+    Append a JSON line to a file; recipients look like {"channel": "file", "path": "..."}
+    """
+    name = "file"
+
+    def recipient_address(self, recipient: Dict[str, Any]) -> str:
+        return recipient['path']
+
+    def deliver(self, recipient: Dict[str, Any], subject: str, body: str) -> None:
+        path = recipient['path']
+        record = {'sent': datetime.datetime.now().isoformat(), 'subject': subject, 'body': body}
+        with state.file_lock(path):
+            with open(path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+def message_id(subject: str, body: str) -> str:
+    """
+    Stable id for a message, used to avoid sending it to a recipient twice
+    """
+    return hashlib.sha256(f"{subject}\n{body}".encode('utf-8')).hexdigest()[:16]
+
+def validate_recipients(data: Any, source: str) -> List[Dict[str, Any]]:
+    """
+    Keep the well-formed entries of a parsed recipient list
+    The list must hold objects with a string "channel"; anything else is
+    skipped with a warning. Only positions and types are logged, never the
+    entries themselves, since they carry addresses and webhook tokens.
+    """
+    if not isinstance(data, list):
+        logger.error(f"Recipients in {source} must be a list of objects, got {type(data).__name__}; ignoring them")
+        return []
+
+    recipients = []
+    for index, entry in enumerate(data):
+        if not isinstance(entry, dict):
+            logger.warning(f"Skipping recipient #{index} in {source}: expected an object, got {type(entry).__name__}")
+            continue
+        if not isinstance(entry.get('channel'), str):
+            logger.warning(f"Skipping recipient #{index} in {source}: missing \"channel\"")
+            continue
+        recipients.append(entry)
+    return recipients
+
+def parse_recipients(text: str, source: str) -> List[Dict[str, Any]]:
+    """
+    Parse a JSON recipient list, e.g. from an environment variable, or []
+    if it isn't valid
+    """
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        # Only reports the position, never the text itself
+        logger.error(f"Error parsing recipients from {source}: {e}")
+        return []
+    return validate_recipients(data, source)
+
+def load_recipients(path: str) -> List[Dict[str, Any]]:
+    """
+    Load the recipient list from a JSON file, or [] if it doesn't exist or
+    isn't a list of recipients
+    """
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        logger.error(f"Error loading recipients from {path}: {e}")
+        return []
+    return validate_recipients(data, path)
+
+class Notifier:
+    """
+    Delivers a message to every recipient concurrently on a bounded pool
+    Failed deliveries go to a retry queue in `state_file` and are retried
+    (before new messages) on later dispatches, up to `max_attempts`. Each
+    recipient's delivered message ids are remembered, so a retry or a rerun
+    never sends the same message to a recipient twice.
+    The state file is committed to the repo, so it only ever holds recipient
+    keys, HMACs of the addresses under `key_secret`; queued jobs are matched
+    back to the current recipient list when they are retried. Changing the
+    secret orphans the stored queue and delivery history.
+    """
+
+    def __init__(self, channels: List[Channel], state_file: str, key_secret: str,
+                 max_workers: int = 8, max_attempts: int = 5):
+        if not key_secret:
+            raise ValueError("key_secret must not be empty")
+        self.channels = {channel.name: channel for channel in channels}
+        self.state_file = state_file
+        self.key_secret = key_secret.encode('utf-8')
+        self.max_workers = max_workers
+        self.max_attempts = max_attempts
+
+    def recipient_key(self, recipient: Dict[str, Any]) -> Optional[str]:
+        """
+        Return "<channel>:<HMAC of address>", or None if the recipient can't be delivered to
+        The address itself (an email or a webhook URL with a token) never
+        leaves the process, and without the secret the key can't be checked
+        against guessed addresses.
+        """
+        channel = self.channels.get(recipient.get('channel', ''))
+        if not channel:
+            return None
+        try:
+            address = channel.recipient_address(recipient)
+        except KeyError:
+            return None
+        digest = hmac.new(self.key_secret, f"{channel.name}:{address}".encode('utf-8'), hashlib.sha256).hexdigest()[:16]
+        return f"{channel.name}:{digest}"
+
+    def _resolve(self, recipients: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        resolved = {}
+        for recipient in recipients:
+            key = self.recipient_key(recipient)
+            if key is None:
+                logger.warning(f"Skipping recipient with no configured channel ({recipient.get('channel')!r})")
+                continue
+            resolved[key] = recipient
+        return resolved
+
+    def _load_state(self) -> Dict[str, Any]:
+        empty = {'version': NOTIFY_STATE_VERSION, 'queue': [], 'delivered': {}}
+        if not os.path.exists(self.state_file):
+            return empty
+        try:
+            with open(self.state_file, 'r') as f:
+                data = json.load(f)
+            if data.get('version') != NOTIFY_STATE_VERSION:
+                raise ValueError(f"unsupported version {data.get('version')!r}")
+            return data
+        except Exception as e:
+            logger.error(f"Error reading notifier state {self.state_file}, starting fresh: {e}")
+            return empty
+
+    def _save_state(self, notify_state: Dict[str, Any]) -> None:
+        state.atomic_write_json(self.state_file, notify_state, indent=2)
+
+    def _deliver(self, recipient: Dict[str, Any], job: Dict[str, Any]) -> None:
+        self.channels[recipient['channel']].deliver(recipient, job['subject'], job['body'])
+
+    def dispatch(self, recipients: List[Dict[str, Any]], subject: str, body: str, force: bool = False) -> Dict[str, bool]:
+        """
+        Send a message to `recipients`, retrying any queued failures as well
+        Recipients who already got this exact message are skipped (and
+        reported as delivered) unless `force` is set, for an explicit resend.
+        Returns {recipient_key: delivered} for this message's recipients. A
+        False entry has been queued for retry.
+        """
+        mid = message_id(subject, body)
+        resolved = self._resolve(recipients)
+        new_jobs = [
+            {'recipient': key, 'subject': subject, 'body': body, 'message_id': mid, 'attempts': 0}
+            for key in resolved
+        ]
+        return self._run(resolved, new_jobs, mid, force)
+
+    def retry_queued(self, recipients: List[Dict[str, Any]]) -> None:
+        """
+        Retry queued failed deliveries without sending anything new
+        Queued jobs whose recipient is no longer in `recipients` are dropped.
+        """
+        self._run(self._resolve(recipients), [], None)
+
+    def _run(self, resolved: Dict[str, Dict[str, Any]], new_jobs: List[Dict[str, Any]], mid: Optional[str],
+             force: bool = False) -> Dict[str, bool]:
+        with state.file_lock(self.state_file):
+            notify_state = self._load_state()
+            delivered = notify_state['delivered']
+
+            # Queued retries first, then the new message; skip anything already delivered
+            jobs: Dict[tuple, Dict[str, Any]] = {}
+            # Jobs for channels not configured this run (e.g. no SMTP password) wait for a later one
+            held: List[Dict[str, Any]] = []
+            for job in notify_state['queue'] + new_jobs:
+                key = job['recipient']
+                if key.split(':', 1)[0] not in self.channels:
+                    held.append(job)
+                    continue
+                if key not in resolved:
+                    logger.warning(f"Dropping queued delivery of {job['message_id']} to {key}: no longer a recipient")
+                    continue
+                if (key, job['message_id']) in jobs:
+                    continue
+                if job['message_id'] in delivered.get(key, []) and not (force and job['message_id'] == mid):
+                    continue
+                jobs[(key, job['message_id'])] = job
+
+            # Persist every pending job before sending, so a crash mid-delivery loses nothing
+            notify_state['queue'] = held + list(jobs.values())
+            self._save_state(notify_state)
+
+            results: Dict[str, bool] = {}
+            for job in new_jobs:
+                key = job['recipient']
+                if not force and mid in delivered.get(key, []):
+                    logger.info(f"Already delivered {mid} to {key}, not sending it again")
+                    results[key] = True
+
+            if not jobs:
+                return results
+
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(jobs))) as pool:
+                futures = {
+                    pool.submit(self._deliver, resolved[job['recipient']], job): job_key
+                    for job_key, job in jobs.items()
+                }
+                for future in as_completed(futures):
+                    job_key = futures[future]
+                    key, job_mid = job_key
+                    job = jobs[job_key]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        job['attempts'] += 1
+                        # Only the exception type: messages can echo the address or webhook URL
+                        logger.error(f"Delivery to {key} failed (attempt {job['attempts']}/{self.max_attempts}): {type(e).__name__}")
+                        if job['attempts'] >= self.max_attempts:
+                            logger.error(f"Giving up on delivery of {job_mid} to {key}")
+                            del jobs[job_key]
+                        ok = False
+                    else:
+                        logger.info(f"Delivered {job_mid} to {key}")
+                        history = delivered.setdefault(key, [])
+                        history.append(job_mid)
+                        del history[:-DELIVERED_HISTORY]
+                        del jobs[job_key]
+                        ok = True
+
+                    if job_mid == mid:
+                        results[key] = ok
+                    notify_state['queue'] = held + list(jobs.values())
+                    self._save_state(notify_state)
+
+        return results
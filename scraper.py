@@ -4,8 +4,11 @@ import json
 import datetime
 import re
 
+import state
+
 # URL for MLB transactions
 MLB_TRANSACTIONS_URL = "https://www.mlb.com/transactions"
+TRANSACTIONS_FILE = 'transactions.json'
 
 def get_transactions():
     """Scrape MLB transactions and save them to a JSON file"""
@@ -75,9 +78,9 @@ def get_transactions():
         'transactions': transactions
     }
     
-    # Save to JSON file
-    with open('transactions.json', 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    # Save to JSON file (atomically, so a crash never leaves a truncated file)
+    with state.file_lock(TRANSACTIONS_FILE):
+        state.atomic_write_json(TRANSACTIONS_FILE, data, ensure_ascii=False, indent=2)
 
 if __name__ == "__main__":
     get_transactions()
\ No newline at end of file
@@ -0,0 +1,196 @@
+# state.py - Crash-safe persistence for the checker and scraper
+import contextlib
+import datetime
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Iterator, List, Optional, IO
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout of the checker state file changes
+STATE_VERSION = 1
+
+# Locks currently held by each thread, so nested acquisitions don't deadlock.
+# Other threads still block, since each takes its own flock on a separate open file.
+_local = threading.local()
+
+def _fsync_directory(directory: str) -> None:
+    """
+    Flush a directory entry so a completed rename survives a power loss
+    """
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+@contextlib.contextmanager
+def atomic_output(path: str, mode: str = 'w', encoding: Optional[str] = 'utf-8') -> Iterator[IO]:
+    """
+    Open a temporary file next to `path` and move it into place on success
+    The data is fsynced before the rename, so readers only ever see the old
+    file or the complete new one. On error the temporary file is removed.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        if 'b' in mode:
+            f = os.fdopen(fd, mode)
+        else:
+            f = os.fdopen(fd, mode, encoding=encoding)
+        with f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        raise
+    _fsync_directory(directory)
+
+def atomic_write_json(path: str, data: Any, **dump_kwargs: Any) -> None:
+    """
+    Serialize `data` to `path` as JSON without ever leaving a partial file
+    """
+    with atomic_output(path, 'w') as f:
+        json.dump(data, f, **dump_kwargs)
+
+@contextlib.contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    """
+    Hold an exclusive advisory lock on `path` + ".lock"
+    Blocks until any other process holding the lock releases it. Re-entering
+    the lock from the same thread is allowed and does not block.
+    """
+    lock_path = os.path.abspath(path) + ".lock"
+    if not hasattr(_local, 'held_locks'):
+        _local.held_locks = {}
+    held: Dict[str, int] = _local.held_locks
+
+    if lock_path in held:
+        held[lock_path] += 1
+        try:
+            yield
+        finally:
+            held[lock_path] -= 1
+        return
+
+    with open(lock_path, 'a') as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        held[lock_path] = 1
+        try:
+            yield
+        finally:
+            del held[lock_path]
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+def default_state() -> Dict[str, Any]:
+    """
+    State used when nothing has been stored yet
+    """
+    return {
+        'version': STATE_VERSION,
+        'last_check': None,
+        'last_transactions': [],
+    }
+
+def _migrate_legacy_state(legacy_check_file: Optional[str], legacy_transactions_file: Optional[str]) -> Optional[Dict[str, Any]]:
+    """
+    Build a state dict from the old last_check.json / last_transactions.json pair
+    Returns None if neither legacy file exists.
+    """
+    state = default_state()
+    found = False
+
+    if legacy_check_file and os.path.exists(legacy_check_file):
+        try:
+            with open(legacy_check_file, 'r') as f:
+                state['last_check'] = json.load(f).get('last_check')
+            found = True
+        except Exception as e:
+            logger.error(f"Error reading legacy check file {legacy_check_file}: {e}")
+
+    if legacy_transactions_file and os.path.exists(legacy_transactions_file):
+        try:
+            with open(legacy_transactions_file, 'r') as f:
+                state['last_transactions'] = json.load(f)
+            found = True
+        except Exception as e:
+            logger.error(f"Error reading legacy transactions file {legacy_transactions_file}: {e}")
+
+    return state if found else None
+
+def load_state(path: str, legacy_check_file: Optional[str] = None, legacy_transactions_file: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Load the versioned checker state from `path`
+    Falls back to the legacy two-file layout the first time it runs, and to
+    an empty state if nothing has been stored yet.
+    """
+    if not os.path.exists(path):
+        migrated = _migrate_legacy_state(legacy_check_file, legacy_transactions_file)
+        if migrated is not None:
+            logger.info("Migrated legacy state files into versioned state")
+            return migrated
+        return default_state()
+
+    with open(path, 'r') as f:
+        data = json.load(f)
+
+    version = data.get('version')
+    if version != STATE_VERSION:
+        raise ValueError(f"Unsupported state version {version!r} in {path}")
+
+    state = default_state()
+    state.update(data)
+    return state
+
+def save_state(path: str, state: Dict[str, Any]) -> None:
+    """
+    Atomically write the checker state to `path`
+    """
+    data = dict(state)
+    data['version'] = STATE_VERSION
+    atomic_write_json(path, data, indent=2)
+
+def update_state(path: str, legacy_check_file: Optional[str] = None, legacy_transactions_file: Optional[str] = None, **changes: Any) -> Dict[str, Any]:
+    """
+    Read-modify-write the checker state under the state lock
+    Returns the state as written.
+    """
+    with file_lock(path):
+        try:
+            state = load_state(path, legacy_check_file, legacy_transactions_file)
+        except (json.JSONDecodeError, OSError) as e:
+            # Start over rather than wedge every future run. A version mismatch is
+            # not caught: a file from a newer version must not be erased.
+            logger.error(f"Unreadable state in {path}, resetting: {e}")
+            state = default_state()
+        state.update(changes)
+        save_state(path, state)
+    return state
+
+def parse_last_check(state: Dict[str, Any]) -> Optional[datetime.datetime]:
+    """
+    Return the stored last check time, or None if there isn't one
+    """
+    value = state.get('last_check')
+    if not value:
+        return None
+    return datetime.datetime.fromisoformat(value)
+
+def get_stored_transactions(state: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Return the transactions stored from the previous check
+    """
+    return list(state.get('last_transactions') or [])
@@ -0,0 +1,219 @@
+# watchlist.py - Player, team and keyword watchlists matched with Aho-Corasick
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Pattern, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Sections of the watchlist file, all optional
+WATCHLIST_SECTIONS = ('teams', 'players', 'keywords')
+
+# Matching is substring based, so anything shorter would hit nearly every transaction
+MIN_PATTERN_LENGTH = 3
+
+# Position glued to the front of the player name in scraped details ("LHPJhonathan Díaz")
+POSITION_PREFIX = r'(?:RHP|LHP|1B|2B|3B|SS|LF|CF|RF|OF|IF|DH|C|P)?'
+
+class AhoCorasick:
+    """
+    Multi-pattern matcher: built once, then each text is scanned in a single
+    pass regardless of how many patterns there are
+    Matching is case-insensitive and substring based, since the scraped
+    details run words together (e.g. "Los Angeles Angelsplaced 1BNolan Schanuelon").
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.patterns: List[str] = []
+        # Trie transitions, failure links and the patterns that end at each node
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[int]] = [[]]
+
+        seen = set()
+        for pattern in patterns:
+            key = pattern.strip().casefold()
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            self._add(key, len(self.patterns))
+            self.patterns.append(pattern.strip())
+
+        self._build_failure_links()
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def _add(self, key: str, index: int) -> None:
+        node = 0
+        for ch in key:
+            next_node = self._goto[node].get(ch)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][ch] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = next_node
+        self._out[node].append(index)
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, child in self._goto[node].items():
+                queue.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(ch, 0)
+                # Inherit matches from the failure target so lookups never walk the chain
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+
+    def search(self, text: str) -> Set[str]:
+        """
+        Return the patterns that occur anywhere in `text`
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        found: Set[int] = set()
+        node = 0
+        for ch in text.casefold():
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return {self.patterns[i] for i in found}
+
+def transaction_text(transaction: Dict[str, Any]) -> str:
+    """
+    Text to scan for a transaction: team, raw details, and the details with the
+    player removed
+    The scraper splices "<position><player>" into the middle of phrases
+    ("Seattle Marinersdesignated LHPJhonathan Díazfor assignment."), so the
+    last part lets multi-word keywords like "designated for assignment" match.
+    Newlines separate the parts so no pattern can match across them.
+    """
+    team = transaction.get('team', '')
+    details = transaction.get('details', '')
+    player = transaction.get('player', '')
+
+    stripped = details
+    if player and player != "Unknown Player":
+        stripped = re.sub(POSITION_PREFIX + re.escape(player), ' ', details)
+    stripped = re.sub(r'\s+', ' ', stripped).strip()
+
+    return f"{team}\n{details}\n{stripped}"
+
+def load_watchlist(path: str, team_mapping: Optional[Dict[str, str]] = None) -> Optional[AhoCorasick]:
+    """
+    Build a matcher from a JSON watchlist file
+    The file has optional "teams", "players" and "keywords" lists. Team
+    abbreviations are expanded through `team_mapping` so "NYY" doesn't match
+    arbitrary text. Malformed sections and entries shorter than
+    MIN_PATTERN_LENGTH are skipped with a warning. Returns None if the file
+    is missing, malformed or empty.
+    """
+    if not os.path.exists(path):
+        logger.info(f"No watchlist found at {path}")
+        return None
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except Exception as e:
+        logger.error(f"Error loading watchlist {path}: {e}")
+        return None
+
+    if not isinstance(data, dict):
+        logger.error(f"Watchlist {path} must be an object with {', '.join(WATCHLIST_SECTIONS)} lists, ignoring it")
+        return None
+
+    patterns = []
+    for section in WATCHLIST_SECTIONS:
+        entries = data.get(section, [])
+        if not isinstance(entries, list):
+            logger.warning(f"Watchlist section {section!r} must be a list, skipping it")
+            continue
+
+        for entry in entries:
+            if not isinstance(entry, str):
+                logger.warning(f"Skipping non-string watchlist entry {entry!r} in {section!r}")
+                continue
+            entry = entry.strip()
+            if section == 'teams' and team_mapping:
+                entry = team_mapping.get(entry.upper(), entry)
+            if len(entry) < MIN_PATTERN_LENGTH:
+                logger.warning(f"Skipping watchlist entry {entry!r} in {section!r}: shorter than {MIN_PATTERN_LENGTH} characters")
+                continue
+            patterns.append(entry)
+
+    matcher = AhoCorasick(patterns)
+    if not len(matcher):
+        logger.info("Watchlist is empty")
+        return None
+
+    logger.info(f"Loaded watchlist with {len(matcher)} patterns")
+    return matcher
+
+def compile_naive(patterns: Iterable[str]) -> List[Tuple[str, Pattern[str]]]:
+    """
+    Precompile the reference patterns; re's cache only holds 512, so calling
+    re.search directly would measure recompilation rather than matching
+    """
+    return [(p, re.compile(re.escape(p), re.IGNORECASE)) for p in patterns]
+
+def naive_search(compiled: List[Tuple[str, Pattern[str]]], text: str) -> Set[str]:
+    """
+    Reference implementation: one search per precompiled pattern
+    """
+    return {p for p, regex in compiled if regex.search(text)}
+
+def benchmark(transactions_file: str, pattern_counts: Iterable[int] = (10, 100, 500, 2000), repeat: int = 5) -> None:
+    """
+    Compare the automaton against the per-pattern re.search loop on the
+    transactions in `transactions_file`
+    """
+    with open(transactions_file, 'r', encoding='utf-8') as f:
+        transactions = json.load(f).get('transactions', [])
+    # Same text the checker scans, so keywords like "designated for assignment" can hit
+    texts = [transaction_text(t) for t in transactions]
+
+    # Real player names first so some patterns hit, padded with synthetic names
+    real = sorted({t['player'] for t in transactions if t.get('player') and t['player'] != "Unknown Player"})
+    keywords = ["designated for assignment", "60-day", "10-day injured list", "optioned", "released"]
+
+    print(f"{len(texts)} transactions, best of {repeat} runs")
+    print(f"{'patterns':>8}  {'re.search (ms)':>14}  {'aho-corasick (ms)':>17}  {'speedup':>7}")
+    for count in pattern_counts:
+        patterns = (keywords + real + [f"Synthetic Player{i}" for i in range(count)])[:count]
+
+        # Both are built outside the timed loops, so only matching is measured
+        matcher = AhoCorasick(patterns)
+        compiled = compile_naive(matcher.patterns)
+        for text in texts:
+            assert matcher.search(text) == naive_search(compiled, text)
+
+        naive_times, ac_times = [], []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for text in texts:
+                naive_search(compiled, text)
+            naive_times.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for text in texts:
+                matcher.search(text)
+            ac_times.append(time.perf_counter() - start)
+
+        naive_ms, ac_ms = min(naive_times) * 1000, min(ac_times) * 1000
+        print(f"{count:>8}  {naive_ms:>14.2f}  {ac_ms:>17.2f}  {naive_ms / ac_ms:>6.1f}x")
+
+if __name__ == "__main__":
+    # Usage: python watchlist.py [transactions.json]
+    repo_root = os.path.dirname(os.path.abspath(__file__))
+    benchmark(sys.argv[1] if len(sys.argv) > 1 else os.path.join(repo_root, "transactions.json"))